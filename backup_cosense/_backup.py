@@ -4,13 +4,13 @@ import dataclasses
 import itertools
 import logging
 import math
+import operator
+import os
 import pathlib
 import re
 from typing import Any, Generator, Literal, Optional, Tuple, TypedDict
 
-import jsonschema
-
-from ._json import load_json, save_json
+from ._json import load_json, save_json, validate_json
 from ._utility import CommitTarget
 
 PageOrder = Literal["as-is", "created-asc", "created-desc"]
@@ -163,7 +163,7 @@ def jsonschema_backup() -> dict[str, Any]:
     return schema
 
 
-@dataclasses.dataclass(order=True, frozen=True)
+@dataclasses.dataclass(order=True, frozen=True, slots=True)
 class Location:
     title: str
     line: int
@@ -182,19 +182,19 @@ class Location:
         return schema
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class InternalLinkNode:
     name: str
     type: InternalLinkType
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class InternalLink:
     node: InternalLinkNode
     to_links: list[InternalLinkNode]
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class ExternalLink:
     url: str
     locations: list[Location]
@@ -207,18 +207,19 @@ class BackupFilePath:
     info: pathlib.Path
 
     def load_backup(self) -> Optional[BackupJSON]:
-        return load_json(self.backup, schema=jsonschema_backup())
+        return load_json(self.backup, schema=jsonschema_backup)
 
     def load_info(self) -> Optional[BackupInfoJSON]:
-        return load_json(self.info, schema=jsonschema_backup_info())
+        return load_json(self.info, schema=jsonschema_backup_info)
 
     def load(self) -> Optional[BackupData]:
-        backup = self.load_backup()
+        # JSON Schema validation in BackupData
+        backup = load_json(self.backup)
         if backup is None:
             return None
         return BackupData(
             backup=backup,
-            info=self.load_info(),
+            info=load_json(self.info),
         )
 
 
@@ -229,15 +230,9 @@ class BackupData:
 
     def __post_init__(self) -> None:
         # JSONSchema validation
-        jsonschema.validate(
-            instance=self.backup,
-            schema=jsonschema_backup(),
-        )
+        validate_json(self.backup, jsonschema_backup)
         if self.info is not None:
-            jsonschema.validate(
-                instance=self.info,
-                schema=jsonschema_backup_info(),
-            )
+            validate_json(self.info, jsonschema_backup_info)
 
     @property
     def timestamp(self) -> int:
@@ -263,31 +258,29 @@ class BackupData:
                 )
                 for link in page["linksLc"]
             ]
-            to_links.sort(key=lambda node: node.name)
+            to_links.sort(key=operator.attrgetter("name"))
             links.append(
                 InternalLink(
                     node=InternalLinkNode(name=page["title"], type="page"),
                     to_links=to_links,
                 )
             )
-        links.sort(key=lambda link: link.node.name)
+        links.sort(key=operator.attrgetter("node.name"))
         return links
 
     def external_links(self) -> list[ExternalLink]:
-        # regex pattern
-        pattern = re.compile(r"https?://[^\s\]]+")
-        # links
-        links: list[ExternalLink] = []
+        # links merged by URL
+        links_by_url: dict[str, ExternalLink] = {}
         for page in self.backup["pages"]:
             for line, location in _filter_code(page):
-                for url in pattern.findall(line):
-                    found = next((link for link in links if link.url == url), None)
+                for url in _EXTERNAL_LINK_PATTERN.findall(line):
+                    found = links_by_url.get(url)
                     if found is not None:
                         found.locations.append(location)
                     else:
-                        links.append(ExternalLink(url=url, locations=[location]))
+                        links_by_url[url] = ExternalLink(url=url, locations=[location])
         # sort
-        links.sort(key=lambda link: link.url)
+        links = sorted(links_by_url.values(), key=operator.attrgetter("url"))
         for link in links:
             link.locations.sort()
         return links
@@ -418,7 +411,7 @@ class BackupArchive:
     def backups(self) -> list[BackupFilePath]:
         backups = self._directory.find_all()
         # sort by old...new
-        return sorted(backups, key=lambda backup: backup.timestamp)
+        return sorted(backups, key=operator.attrgetter("timestamp"))
 
 
 def _sort_pages(
@@ -429,7 +422,7 @@ def _sort_pages(
         case None | "as-is":
             pass
         case "created-asc":
-            pages.sort(key=lambda page: page["created"])
+            pages.sort(key=operator.itemgetter("created"))
         case "created-desc":
             pages.sort(key=lambda page: -page["created"])
 
@@ -448,6 +441,9 @@ def _normalize_page_title(title: str) -> str:
     return title.lower().replace(" ", "_")
 
 
+_EXTERNAL_LINK_PATTERN = re.compile(r"https?://[^\s\]]+")
+
+
 def _filter_code(page: BackupPageJSON) -> Generator[Tuple[str, Location], None, None]:
     title = page["title"]
     # regex
@@ -522,8 +518,7 @@ def _update_backup(
         if current.info != previous.info:
             if current.info is None:
                 logger.debug(f'delete "{file_path.info}"')
-                if file_path.info.exists():
-                    file_path.info.unlink()
+                file_path.info.unlink(missing_ok=True)
                 deleted.add(file_path.info)
             elif previous.info is None:
                 logger.debug(f'add "{file_path.info}"')
@@ -546,6 +541,7 @@ def _update_pages(
     updated: set[pathlib.Path] = set()
     deleted: set[pathlib.Path] = set()
     # diff
+    #  pages have been validated with the whole backup in BackupData
     pages_diff = _diff_pages(current, previous)
     # deleted pages
     for page in pages_diff.deleted:
@@ -557,13 +553,13 @@ def _update_pages(
     for page in pages_diff.updated:
         page_path = _page_to_file_path(directory, page)
         logger.debug(f'update "{page_path}"')
-        save_json(page_path, page, schema=jsonschema_backup_page())
+        save_json(page_path, page)
         updated.add(page_path)
     # added pages
     for page in pages_diff.added:
         page_path = _page_to_file_path(directory, page)
         logger.debug(f'add "{page_path}"')
-        save_json(page_path, page, schema=jsonschema_backup_page())
+        save_json(page_path, page)
         added.add(page_path)
     return CommitTarget(added=added, updated=updated, deleted=deleted)
 
@@ -620,20 +616,14 @@ class _ArchiveDirectory:
             return result
         # iterate files
         pattern = re.compile(r"^(?P<timestamp>[0-9]+)\.json$")
-        for path in self._path.iterdir():
-            if not path.is_file():
-                continue
-            # check if the filename is '{timestamp}.json'
-            match = pattern.match(path.name)
-            if match:
+        with os.scandir(self._path) as entries:
+            for entry in entries:
+                # check if the filename is '{timestamp}.json'
+                match = pattern.match(entry.name)
+                if match is None or not entry.is_file():
+                    continue
                 timestamp = int(match.group("timestamp"))
-                result.append(
-                    BackupFilePath(
-                        timestamp=timestamp,
-                        backup=path,
-                        info=path.with_suffix(".info.json"),
-                    )
-                )
+                result.append(self.file_path(timestamp))
         return result
 
 
@@ -657,13 +647,14 @@ class _ArchiveDirectoryTree:
             return result
         # iterate directories
         pattern = re.compile(r"^(?P<quotient>[0-9]+)$")
-        for path in self._path.iterdir():
-            if not path.is_dir():
-                continue
-            # check if the directory name is 'timestamp / 1.0e+7'
-            match = pattern.match(path.name)
-            if match:
+        with os.scandir(self._path) as entries:
+            for entry in entries:
+                # check if the directory name is 'timestamp / 1.0e+7'
+                match = pattern.match(entry.name)
+                if match is None or not entry.is_dir():
+                    continue
                 quotient = int(match.group("quotient"))
+                path = pathlib.Path(entry.path)
                 file_paths = _ArchiveDirectory(path).find_all()
                 if any(
                     math.floor(file_path.timestamp / 1.0e7) != quotient
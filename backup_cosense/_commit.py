@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import contextlib
 import datetime
 import logging
+import operator
 from typing import Optional
 
 from ._backup import BackupFilePath, BackupRepository
 from ._config import Config, GitEmptyInitialCommitConfig
 from ._external_link import save_external_links
+from ._external_link_request import ExternalLinkSession
 from ._git import Commit, CommitTarget, Git
 from ._utility import format_timestamp
 from .exceptions import InitialCommitError
@@ -36,15 +39,22 @@ def commit_backups(
     # backup targets
     backup_targets = _backup_targets(config, git, logger)
     # commit
-    for target in backup_targets:
-        logger.info(f"commit {format_timestamp(target.timestamp)}")
-        # commit
-        commit_backup(
-            config,
-            target,
-            backup_repository=backup_repository,
-            logger=logger,
-        )
+    #  external links are requested with the same session for all backups
+    with (
+        ExternalLinkSession(config.external_link)
+        if config.external_link.enabled
+        else contextlib.nullcontext()
+    ) as external_link_session:
+        for target in backup_targets:
+            logger.info(f"commit {format_timestamp(target.timestamp)}")
+            # commit
+            commit_backup(
+                config,
+                target,
+                backup_repository=backup_repository,
+                external_link_session=external_link_session,
+                logger=logger,
+            )
 
 
 def commit_backup(
@@ -52,6 +62,7 @@ def commit_backup(
     data: BackupFilePath,
     *,
     backup_repository: Optional[BackupRepository] = None,
+    external_link_session: Optional[ExternalLinkSession] = None,
     logger: Optional[logging.Logger] = None,
 ) -> None:
     logger = logger or logging.getLogger(__name__)
@@ -69,6 +80,7 @@ def commit_backup(
         config,
         data,
         backup_repository=backup_repository,
+        external_link_session=external_link_session,
         logger=logger,
     )
     if commit_target is None:
@@ -93,6 +105,7 @@ def staging_backup(
     backup_path: BackupFilePath,
     *,
     backup_repository: Optional[BackupRepository] = None,
+    external_link_session: Optional[ExternalLinkSession] = None,
     logger: Optional[logging.Logger] = None,
 ) -> Optional[CommitTarget]:
     logger = logger or logging.getLogger(__name__)
@@ -125,6 +138,7 @@ def staging_backup(
                 data.external_links(),
                 git.path,
                 config=config.external_link,
+                session=external_link_session,
                 logger=logger,
             )
         )
@@ -199,7 +213,7 @@ def _initial_commit_timestamp(
             return timestamp
         case "oldest_created_page":
             # select oldest data
-            backup = min(backups, default=None, key=lambda backup: backup.timestamp)
+            backup = min(backups, default=None, key=operator.attrgetter("timestamp"))
             if backup is None:
                 raise InitialCommitError(
                     "Since there is no backup, unable to define timestamp"
@@ -2,11 +2,11 @@ from __future__ import annotations
 
 import dataclasses
 import datetime
+import functools
 import logging
 import pathlib
-from typing import Any, Literal, Optional, get_args
+from typing import Any, Callable, Literal, Optional, get_args
 
-import dacite
 import fake_useragent
 import jsonschema
 import toml
@@ -141,8 +141,10 @@ class CosenseConfig:
     session_id: str
     backup_archive: BackupArchiveConfig
     domain: Literal["scrapbox.io", "cosen.se"] = "scrapbox.io"
+    parallel_limit: int = 1
     request_interval: float = 3.0
     request_timeout: float = 10.0
+    request_retries: int = 3
     user_agent: Optional[UserAgentConfig] = None
     backup_start_date: Optional[datetime.datetime] = None
 
@@ -157,6 +159,10 @@ class CosenseConfig:
                 "session_id": {"type": "string"},
                 "backup_archive": BackupArchiveConfig.jsonschema(),
                 "domain": {"enum": ["scrapbox.io", "cosen.se"]},
+                "parallel_limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
                 "request_interval": {
                     "type": "number",
                     "exclusiveMinimum": 0.0,
@@ -165,6 +171,10 @@ class CosenseConfig:
                     "type": "number",
                     "exclusiveMinimum": 0.0,
                 },
+                "request_retries": {
+                    "type": "integer",
+                    "minimum": 0,
+                },
                 "user_agent": UserAgentConfig.jsonschema(),
                 "backup_start_date": {"type": ["date", "datetime"]},
             },
@@ -252,7 +262,7 @@ class GitConfig:
 @dataclasses.dataclass(frozen=True)
 class ExternalLinkSessionConfig:
     timeout: float = 30
-    parallel_limit_per_host: int = 0
+    parallel_limit_per_host: int = 4
     user_agent: Optional[UserAgentConfig] = None
     request_headers: dict[str, str] = dataclasses.field(default_factory=dict)
 
@@ -291,6 +301,7 @@ class ExternalLinkConfig:
     session: ExternalLinkSessionConfig = ExternalLinkSessionConfig()
     parallel_limit: int = 5
     request_interval: float = 1.0
+    request_retries: int = 0
     content_types: list[str] = dataclasses.field(default_factory=list)
     excluded_urls: list[str] = dataclasses.field(default_factory=list)
     allways_request_all_links: bool = False
@@ -316,6 +327,10 @@ class ExternalLinkConfig:
                     "type": "number",
                     "exclusiveMinimum": 0.0,
                 },
+                "request_retries": {
+                    "type": "integer",
+                    "minimum": 0,
+                },
                 "content_types": {
                     "type": "array",
                     "items": {"type": "string"},
@@ -367,30 +382,32 @@ def load_config(
     logger: Optional[logging.Logger] = None,
 ) -> Config:
     logger = logger or logging.getLogger(__name__)
+    # cached until the file is modified
+    return _load_config(path.resolve(), path.stat().st_mtime_ns, logger)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_config(
+    path: pathlib.Path,
+    _modified: int,
+    logger: logging.Logger,
+) -> Config:
     # load TOML
     logger.info(f'load config from "{path}"')
     with path.open(encoding="utf-8") as file:
         loaded = toml.load(file)
-    logger.debug(f"loaded toml: {repr(loaded)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"loaded toml: {repr(loaded)}")
     # JSON Schema validation
     _validator().validate(instance=loaded)
     # to dataclass
-    config = dacite.from_dict(
-        data_class=Config,
-        data=loaded,
-        config=dacite.Config(
-            type_hooks={
-                datetime.datetime: _to_datetime,
-                BackupArchiveConfig: _to_backup_archive,
-                UserAgentConfig: _to_user_agent,
-            },
-            strict=True,
-        ),
-    )
-    logger.debug(f"config: {repr(config)}")
+    config = _to_config(loaded)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"config: {repr(config)}")
     return config
 
 
+@functools.cache
 def _validator() -> jsonschema.protocols.Validator:
     Validator = jsonschema.Draft202012Validator
     type_checker = Validator.TYPE_CHECKER.redefine_many(
@@ -421,6 +438,81 @@ def _is_datetime(
     return isinstance(instance, datetime.datetime)
 
 
+def _convert(
+    value: dict[str, Any],
+    converters: dict[str, Callable[[Any], Any]],
+) -> dict[str, Any]:
+    return {
+        key: converters[key](x) if key in converters else x for key, x in value.items()
+    }
+
+
+def _to_config(value: dict[str, Any]) -> Config:
+    return Config(
+        **_convert(
+            value,
+            {
+                "cosense": _to_cosense,
+                "git": _to_git,
+                "external_link": _to_external_link,
+            },
+        )
+    )
+
+
+def _to_cosense(value: dict[str, Any]) -> CosenseConfig:
+    return CosenseConfig(
+        **_convert(
+            value,
+            {
+                "backup_archive": _to_backup_archive,
+                "user_agent": _to_user_agent,
+                "backup_start_date": _to_datetime,
+            },
+        )
+    )
+
+
+def _to_git(value: dict[str, Any]) -> GitConfig:
+    return GitConfig(
+        **_convert(
+            value,
+            {"empty_initial_commit": _to_git_empty_initial_commit},
+        )
+    )
+
+
+def _to_git_empty_initial_commit(
+    value: dict[str, Any],
+) -> GitEmptyInitialCommitConfig:
+    return GitEmptyInitialCommitConfig(
+        **_convert(
+            value,
+            {
+                "timestamp": lambda x: x if isinstance(x, str) else _to_datetime(x),
+            },
+        )
+    )
+
+
+def _to_external_link(value: dict[str, Any]) -> ExternalLinkConfig:
+    return ExternalLinkConfig(
+        **_convert(
+            value,
+            {"session": _to_external_link_session},
+        )
+    )
+
+
+def _to_external_link_session(value: dict[str, Any]) -> ExternalLinkSessionConfig:
+    return ExternalLinkSessionConfig(
+        **_convert(
+            value,
+            {"user_agent": _to_user_agent},
+        )
+    )
+
+
 def _to_backup_archive(value: str | dict) -> BackupArchiveConfig:
     if isinstance(value, str):
         value = {"name": value}
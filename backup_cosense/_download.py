@@ -1,20 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-import time
+import operator
 from typing import Any, Callable, Optional, TypedDict
 
-import requests
+import aiohttp
+import yarl
 
-from ._backup import (
-    BackupInfoJSON,
-    BackupJSON,
-    jsonschema_backup,
-    jsonschema_backup_info,
-)
+from ._backup import BackupInfoJSON, jsonschema_backup, jsonschema_backup_info
 from ._config import Config
-from ._json import request_json, save_json
-from ._utility import format_timestamp
+from ._json import download_json, request_json, save_json
+from ._utility import format_timestamp, run_async
 
 
 class BackupListJSON(TypedDict):
@@ -44,17 +41,34 @@ def download_backups(
     logger: Optional[logging.Logger] = None,
 ) -> None:
     logger = logger or logging.getLogger(__name__)
-    with _session(config) as session:
+    run_async(_download_backups(config, logger))
+
+
+async def _download_backups(
+    config: Config,
+    logger: logging.Logger,
+) -> None:
+    base_url = _base_url(config)
+    async with _session(config) as session:
         # list
-        backup_list = _request_backup_list(config, session, logger)
-        time.sleep(config.cosense.request_interval)
+        backup_list = await _request_backup_list(config, session, base_url, logger)
+        await asyncio.sleep(config.cosense.request_interval)
         if not backup_list:
             return
+        # semaphore
+        semaphore = asyncio.Semaphore(config.cosense.parallel_limit)
+
+        # parallel downloads
+        async def _parallel_download(info: BackupInfoJSON) -> None:
+            async with semaphore:
+                await _download_backup(config, session, base_url, info, logger)
+                await asyncio.sleep(config.cosense.request_interval)
+
         # backup
-        for info in filter(_backup_filter(config, logger), backup_list):
-            # download
-            _download_backup(config, session, info, logger)
-            time.sleep(config.cosense.request_interval)
+        #  a failed download cancels the others, running their cleanup
+        async with asyncio.TaskGroup() as task_group:
+            for info in filter(_backup_filter(config, logger), backup_list):
+                task_group.create_task(_parallel_download(info))
 
 
 def _base_url(config: Config) -> str:
@@ -63,33 +77,49 @@ def _base_url(config: Config) -> str:
     return f"https://{domain}/api/project-backup/{project}"
 
 
-def _session(config: Config) -> requests.Session:
-    session = requests.Session()
+def _session(config: Config) -> aiohttp.ClientSession:
+    # user agent
+    headers: dict[str, str] = {}
+    if config.cosense.user_agent is not None:
+        headers["User-Agent"] = config.cosense.user_agent.create()
+    # timeout for connecting and for each read, not for the whole download
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=config.cosense.request_timeout,
+        sock_read=config.cosense.request_timeout,
+    )
+    # connection pool sized to the parallel downloads,
+    # keeping idle connections alive over the request interval
+    connector = aiohttp.TCPConnector(
+        limit=config.cosense.parallel_limit,
+        keepalive_timeout=config.cosense.request_interval + 15.0,
+    )
+    session = aiohttp.ClientSession(
+        connector=connector,
+        headers=headers,
+        timeout=timeout,
+    )
     # cookie
     domains = ["scrapbox.io", "cosen.se"]
     for domain in domains:
-        session.cookies.set(
-            "connect.sid",
-            config.cosense.session_id,
-            domain=domain,
+        session.cookie_jar.update_cookies(
+            {"connect.sid": config.cosense.session_id},
+            response_url=yarl.URL(f"https://{domain}"),
         )
-    # user agent
-    if config.cosense.user_agent is not None:
-        session.headers.update({"User-Agent": config.cosense.user_agent.create()})
     return session
 
 
-def _request_backup_list(
+async def _request_backup_list(
     config: Config,
-    session: requests.Session,
+    session: aiohttp.ClientSession,
+    base_url: str,
     logger: logging.Logger,
 ) -> list[BackupInfoJSON]:
     # request to .../project-backup/list
-    response: Optional[BackupListJSON] = request_json(
-        f"{_base_url(config)}/list",
-        session=session,
-        timeout=config.cosense.request_timeout,
-        schema=jsonschema_backup_list(),
+    response: Optional[BackupListJSON] = await request_json(
+        f"{base_url}/list",
+        session,
+        retries=config.cosense.request_retries,
+        schema=jsonschema_backup_list,
         logger=logger,
     )
     # failed to request
@@ -102,15 +132,14 @@ def _request_backup_list(
         logger.info("there are no backup")
         return []
     # output to logger
-    oldest_backup_timestamp = min(info["backuped"] for info in backup_list)
-    latest_backup_timestamp = max(info["backuped"] for info in backup_list)
+    timestamps = [info["backuped"] for info in backup_list]
     logger.info(
         f"there are {len(backup_list)} backups:"
-        f" {format_timestamp(oldest_backup_timestamp)}"
-        f" ~ {format_timestamp(latest_backup_timestamp)}"
+        f" {format_timestamp(min(timestamps))}"
+        f" ~ {format_timestamp(max(timestamps))}"
     )
     # sort by old...new
-    return sorted(backup_list, key=lambda backup: backup["backuped"])
+    return sorted(backup_list, key=operator.itemgetter("backuped"))
 
 
 def _backup_filter(
@@ -127,12 +156,13 @@ def _backup_filter(
     git = config.git.create(logger=logger)
     latest_timestamp = git.latest_commit_timestamp()
     logger.info(f"latest backup: {format_timestamp(latest_timestamp)}")
-    # backup archive
+    # backups already downloaded into the archive
     archive = config.cosense.backup_archive.create(logger=logger)
+    downloaded = {backup.timestamp for backup in archive.backups()}
 
     def backup_filter(backup: BackupInfoJSON) -> bool:
         timestamp = backup["backuped"]
-        if archive.file_path(timestamp).backup.exists():
+        if timestamp in downloaded:
             logger.debug(f"skip {format_timestamp(timestamp)}: already downloaded")
             return False
         if start_timestamp is not None and start_timestamp > timestamp:
@@ -149,9 +179,10 @@ def _backup_filter(
     return backup_filter
 
 
-def _download_backup(
+async def _download_backup(
     config: Config,
-    session: requests.Session,
+    session: aiohttp.ClientSession,
+    base_url: str,
     info: BackupInfoJSON,
     logger: logging.Logger,
 ) -> None:
@@ -159,22 +190,26 @@ def _download_backup(
     timestamp = info["backuped"]
     # request
     logger.info(f"download backup {format_timestamp(timestamp)}")
-    url = f'{_base_url(config)}/{info["id"]}.json'
-    backup: Optional[BackupJSON] = request_json(
-        url,
-        session=session,
-        timeout=config.cosense.request_timeout,
-        schema=jsonschema_backup(),
-        logger=logger,
-    )
-    if backup is None:
-        return
-    # save
+    url = f'{base_url}/{info["id"]}.json'
     archive = config.cosense.backup_archive.create(logger=logger)
     file_path = archive.file_path(timestamp)
-    # save backup
-    logger.info(f'save "{file_path.backup}"')
-    save_json(file_path.backup, backup)
-    # save backup info
+    # save backup info while downloading backup
     logger.info(f'save "{file_path.info}"')
-    save_json(file_path.info, info)
+    save_info = asyncio.create_task(asyncio.to_thread(save_json, file_path.info, info))
+    downloaded = False
+    try:
+        downloaded = await download_json(
+            url,
+            session,
+            file_path.backup,
+            retries=config.cosense.request_retries,
+            schema=jsonschema_backup,
+            logger=logger,
+        )
+    finally:
+        await save_info
+        # remove backup info without backup
+        if not downloaded:
+            file_path.info.unlink(missing_ok=True)
+    if downloaded:
+        logger.info(f'save "{file_path.backup}"')
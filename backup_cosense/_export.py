@@ -1,17 +1,20 @@
 from __future__ import annotations
 
+import collections
+import concurrent.futures
 import dataclasses
 import datetime
 import logging
+import os
 import pathlib
 import subprocess
 import sys
-from typing import Any, Optional
+from typing import Optional
 
 from ._backup import BackupArchive, jsonschema_backup, jsonschema_backup_info
 from ._config import Config
-from ._git import Commit, Git
-from ._json import parse_json, save_json
+from ._git import Commit, Git, GitCatFile
+from ._json import JSONSchema, parse_json, save_json
 from ._utility import format_timestamp
 
 
@@ -44,24 +47,25 @@ def export_backups(
         )
     else:
         logger.info("there are no commits")
+    # export targets of all commits
+    targets = _export_targets(config.cosense.project, git, commits)
+    # dry run: no git cat-file process or worker processes
+    if dry_run:
+        for commit, target in zip(commits, targets):
+            logger.info(f"export {format_timestamp(commit.timestamp)}")
+            _dry_run_export(target, commit, destination)
+        return
     # export
-    for commit in commits:
-        logger.info(f"export {format_timestamp(commit.timestamp)}")
-        if dry_run:
-            _dry_run_export(
-                config.cosense.project,
-                git,
-                commit,
-                destination,
-            )
-            continue
-        _export(
-            config.cosense.project,
-            git,
-            commit,
-            destination,
-            logger,
-        )
+    with (
+        git.cat_file() as cat_file,
+        concurrent.futures.ProcessPoolExecutor() as executor,
+    ):
+        exporter = _JSONExporter(cat_file, executor)
+        for commit, target in zip(commits, targets):
+            logger.info(f"export {format_timestamp(commit.timestamp)}")
+            _export(target, exporter, commit, destination, logger)
+        # wait for pending exports
+        exporter.wait()
 
 
 @dataclasses.dataclass(frozen=True)
@@ -79,24 +83,22 @@ class _ExportRange:
 
 
 def _export(
-    project: str,
-    git: Git,
+    target: _ExportTarget,
+    exporter: _JSONExporter,
     commit: Commit,
     destination: BackupArchive,
     logger: logging.Logger,
 ) -> None:
-    target = _export_target(project, git, commit)
     file_path = destination.file_path(commit.timestamp)
     # save {project}.json
     backup_object = target.backup_object()
     if backup_object is None:
         logger.warning(f"skip commit: {commit.hash}")
         return
-    if not _export_json(
-        git,
+    if not exporter.export(
         backup_object,
         file_path.backup,
-        jsonschema_backup(),
+        jsonschema_backup,
     ):
         logger.warning(f"skip commit: {commit.hash}")
         return
@@ -110,22 +112,19 @@ def _export(
         if info_json is not None:
             save_json(file_path.info, info_json)
             logger.debug(f'save "{file_path.info}"')
-    elif _export_json(
-        git,
+    elif exporter.export(
         info_object,
         file_path.info,
-        jsonschema_backup_info(),
+        jsonschema_backup_info,
     ):
         logger.debug(f'save "{file_path.info}"')
 
 
 def _dry_run_export(
-    project: str,
-    git: Git,
+    target: _ExportTarget,
     commit: Commit,
     destination: BackupArchive,
 ) -> None:
-    target = _export_target(project, git, commit)
     file_path = destination.file_path(commit.timestamp)
     # {project}.json
     if target.has_backup is None:
@@ -157,52 +156,78 @@ class _ExportTarget:
         return None
 
 
-def _export_target(
+def _export_targets(
     project: str,
     git: Git,
-    commit: Commit,
-) -> _ExportTarget:
-    # add / modified files in commit
-    command = [
-        "git",
-        "show",
-        "-z",
-        "--name-only",
-        "--diff-filter=MA",
-        '--format=tformat:""',
-        f"{commit.hash}",
-    ]
+    commits: list[Commit],
+) -> list[_ExportTarget]:
+    backup = f"{project}.json"
+    info = f"{project}.info.json"
+    # add / modified files in all commits
     try:
-        process = git.execute(command)
-    except subprocess.CalledProcessError:
-        return _ExportTarget(
-            commit=commit.hash,
-            project=project,
-            has_backup=False,
-            has_info=False,
+        changed_files = git.changed_files(
+            [commit.hash for commit in commits],
+            [backup, info],
         )
-    names = [x for x in process.stdout.removeprefix('""\0\n').split("\0") if x != ""]
+    except subprocess.CalledProcessError:
+        changed_files = {}
     # {project}.json & {project}.info.json
-    return _ExportTarget(
-        project=project,
-        commit=commit.hash,
-        has_backup=f"{project}.json" in names,
-        has_info=f"{project}.info.json" in names,
-    )
+    targets: list[_ExportTarget] = []
+    for commit in commits:
+        changed = changed_files.get(commit.hash, set())
+        targets.append(
+            _ExportTarget(
+                commit=commit.hash,
+                project=project,
+                has_backup=backup in changed,
+                has_info=info in changed,
+            )
+        )
+    return targets
+
+
+class _JSONExporter:
+    def __init__(
+        self,
+        cat_file: GitCatFile,
+        executor: concurrent.futures.Executor,
+        *,
+        max_pending: Optional[int] = None,
+    ) -> None:
+        self._cat_file = cat_file
+        self._executor = executor
+        self._max_pending = max_pending or 2 * (os.cpu_count() or 1)
+        self._pending: collections.deque[concurrent.futures.Future[None]] = (
+            collections.deque()
+        )
+
+    def export(
+        self,
+        target: str,
+        output: pathlib.Path,
+        schema: Optional[JSONSchema],
+    ) -> bool:
+        # get from git
+        contents = self._cat_file.read(target)
+        if contents is None:
+            return False
+        # limit the number of blobs held in memory
+        while len(self._pending) >= self._max_pending:
+            self._pending.popleft().result()
+        # parse, validate & save in worker process
+        self._pending.append(
+            self._executor.submit(_export_json, contents, output, schema)
+        )
+        return True
+
+    def wait(self) -> None:
+        while self._pending:
+            self._pending.popleft().result()
 
 
 def _export_json(
-    git: Git,
-    target: str,
+    contents: bytes,
     output: pathlib.Path,
-    schema: Optional[dict[str, Any]],
-) -> bool:
-    # get from git
-    command = ["git", "show", target]
-    try:
-        process = git.execute(command)
-    except subprocess.CalledProcessError:
-        return False
-    # save
-    save_json(output, parse_json(process.stdout), schema=schema)
-    return True
+    schema: Optional[JSONSchema],
+) -> None:
+    save_json(output, parse_json(contents), schema=schema)
@@ -1,134 +1,65 @@
 from __future__ import annotations
 
-import asyncio
+import collections
 import dataclasses
 import logging
+import operator
+import os
 import pathlib
 import random
 import re
-import time
-from typing import Any, Callable, Literal, MutableMapping, Optional, Self
+import urllib.parse
+from typing import Any, Callable, Iterator, Literal, Optional, Self
 
 import aiohttp
-import dacite
-import multidict
 
 from ._backup import ExternalLink, Location
-from ._config import ExternalLinkConfig, ExternalLinkSessionConfig
+from ._config import ExternalLinkConfig
+from ._external_link_request import (
+    ExternalLinkLog,
+    ExternalLinkSession,
+    LinksDirectory,
+    RequestError,
+    ResponseLog,
+)
 from ._git import CommitTarget
 from ._json import load_json, save_json
 
 
-@dataclasses.dataclass(frozen=True)
-class ResponseLog:
-    status_code: int
-    content_type: Optional[str]
-
-    @classmethod
-    def jsonschema(cls) -> dict[str, Any]:
-        schema = {
-            "type": "object",
-            "required": ["status_code", "content_type"],
-            "additionalProperties": False,
-            "properties": {
-                "status_code": {"type": "integer"},
-                "content_type": {"type": ["string", "null"]},
-            },
-        }
-        return schema
-
-
-@dataclasses.dataclass(frozen=True)
-class RequestError:
-    error_type: str
-    message: str
-
-    @classmethod
-    def jsonschema(cls) -> dict[str, Any]:
-        schema = {
-            "type": "object",
-            "required": ["error_type", "message"],
-            "additionalProperties": False,
-            "properties": {
-                "error_type": {"type": "string"},
-                "message": {"type": "string"},
-            },
-        }
-        return schema
-
-
-@dataclasses.dataclass(frozen=True)
-class ExternalLinkLog:
-    url: str
-    locations: list[Location]
-    access_timestamp: int
-    response: RequestError | ResponseLog | Literal["excluded"]
-    is_saved: bool
-
-    def link(self) -> ExternalLink:
-        return ExternalLink(url=self.url, locations=self.locations)
-
-    @classmethod
-    def jsonschema(cls) -> dict[str, Any]:
-        schema = {
-            "type": "object",
-            "required": [
-                "url",
-                "locations",
-                "access_timestamp",
-                "response",
-                "is_saved",
-            ],
-            "additionalProperties": False,
-            "properties": {
-                "url": {"type": "string"},
-                "access_timestamp": {"type": "integer"},
-                "locations": {
-                    "type": "array",
-                    "items": Location.jsonschema(),
-                },
-                "response": {
-                    "oneOf": [
-                        ResponseLog.jsonschema(),
-                        RequestError.jsonschema(),
-                        {"const": "excluded"},
-                    ],
-                },
-                "is_saved": {"type": "boolean"},
-            },
-        }
-        return schema
-
-
 def save_external_links(
     timestamp: int,
     external_links: list[ExternalLink],
     git_directory: pathlib.Path,
     *,
     config: Optional[ExternalLinkConfig] = None,
+    session: Optional[ExternalLinkSession] = None,
     create_session: Optional[Callable[[], aiohttp.ClientSession]] = None,
     logger: Optional[logging.Logger] = None,
 ) -> CommitTarget:
     config = config or ExternalLinkConfig()
     logger = logger or logging.getLogger(__name__)
-
-    # session
-    def default_create_session() -> aiohttp.ClientSession:
-        return _create_session(config.session)
-
-    if create_session is None:
-        create_session = default_create_session
+    # session only for this call
+    if session is None:
+        with ExternalLinkSession(config, create_session=create_session) as new_session:
+            return save_external_links(
+                timestamp,
+                external_links,
+                git_directory,
+                config=config,
+                session=new_session,
+                logger=logger,
+            )
     # log directory
     log_directory = _LogDirectory(pathlib.Path(config.log_directory), logger)
     # links directory
-    links_directory = _LinksDirectory(
+    links_directory = LinksDirectory(
         git_directory.joinpath(config.save_directory),
         logger,
     )
     # files saved before request
     already_saved_files = set(links_directory.files())
     # log editor
-    log_editor = _setup_log_editor(
+    log_editor, previous_log = _setup_log_editor(
         timestamp,
         external_links,
         log_directory,
@@ -140,8 +71,10 @@ def save_external_links(
         log_editor,
         links_directory,
         config,
-        create_session,
+        session,
         logger,
+        saved_files=already_saved_files,
+        previous_log=previous_log,
     )
     # save log
     log = log_editor.output()
@@ -159,34 +92,6 @@ def save_external_links(
     )
 
 
-def _create_session(config: ExternalLinkSessionConfig) -> aiohttp.ClientSession:
-    # connector
-    connector = aiohttp.TCPConnector(limit_per_host=config.parallel_limit_per_host)
-    # timeout
-    timeout = aiohttp.ClientTimeout(total=config.timeout)
-    # To fix ClientResponseError
-    #  Got more than 8190 bytes (xxxx) when reading Header value is too long
-    max_size = 8190 * 2
-    return aiohttp.ClientSession(
-        connector=connector,
-        timeout=timeout,
-        headers=_request_headers(config),
-        max_line_size=max_size,
-        max_field_size=max_size,
-    )
-
-
-def _request_headers(config: ExternalLinkSessionConfig) -> multidict.CIMultiDict:
-    headers: multidict.CIMultiDict = multidict.CIMultiDict()
-    # config.user_agent
-    if config.user_agent is not None:
-        headers["User-Agent"] = config.user_agent.create()
-    # config.request_headers
-    for key, value in config.request_headers.items():
-        headers[key] = value
-    return headers
-
-
 @dataclasses.dataclass(frozen=True)
 class _LogFile:
     path: pathlib.Path
@@ -199,24 +104,33 @@ class _Log:
     logs: list[ExternalLinkLog]
 
     @classmethod
-    def load(cls, path: pathlib.Path, timestamp: int) -> Optional[Self]:
-        logs = load_json(path, schema=cls.jsonschema())
+    def load(
+        cls,
+        path: pathlib.Path,
+        timestamp: int,
+        *,
+        validate: bool = True,
+    ) -> Optional[Self]:
+        logs = load_json(path, schema=cls.jsonschema if validate else None)
         if logs is None:
             return None
         return cls(
             timestamp=timestamp,
-            logs=[
-                dacite.from_dict(data_class=ExternalLinkLog, data=log) for log in logs
-            ],
+            logs=[_to_external_link_log(log) for log in logs],
         )
 
-    def save(self, path: pathlib.Path) -> None:
+    def save(
+        self,
+        path: pathlib.Path,
+        *,
+        validate: bool = True,
+    ) -> None:
         # sort by URL
-        logs = sorted(self.logs, key=lambda log: log.url)
+        logs = sorted(self.logs, key=operator.attrgetter("url"))
         save_json(
             path,
-            [dataclasses.asdict(log) for log in logs],
-            schema=self.jsonschema(),
+            [_from_external_link_log(log) for log in logs],
+            schema=self.jsonschema if validate else None,
         )
 
     @classmethod
@@ -228,6 +142,65 @@ class _Log:
         return schema
 
 
+def _to_external_link_log(value: dict[str, Any]) -> ExternalLinkLog:
+    return ExternalLinkLog(
+        url=value["url"],
+        locations=[Location(**location) for location in value["locations"]],
+        access_timestamp=value["access_timestamp"],
+        response=_to_response(value["response"]),
+        is_saved=value["is_saved"],
+    )
+
+
+def _to_response(
+    value: dict[str, Any] | Literal["excluded"],
+) -> RequestError | ResponseLog | Literal["excluded"]:
+    if isinstance(value, str):
+        return value
+    if "status_code" in value:
+        return ResponseLog(**value)
+    return RequestError(**value)
+
+
+def _from_external_link_log(log: ExternalLinkLog) -> dict[str, Any]:
+    return {
+        "url": log.url,
+        "locations": [
+            {"title": location.title, "line": location.line}
+            for location in log.locations
+        ],
+        "access_timestamp": log.access_timestamp,
+        "response": _from_response(log.response),
+        "is_saved": log.is_saved,
+    }
+
+
+def _from_response(
+    response: RequestError | ResponseLog | Literal["excluded"],
+) -> dict[str, Any] | Literal["excluded"]:
+    match response:
+        case ResponseLog():
+            value: dict[str, Any] = {
+                "status_code": response.status_code,
+                "content_type": response.content_type,
+            }
+            # validators only of the saved contents
+            if response.etag is not None:
+                value["etag"] = response.etag
+            if response.last_modified is not None:
+                value["last_modified"] = response.last_modified
+            return value
+        case RequestError():
+            return {
+                "error_type": response.error_type,
+                "message": response.message,
+            }
+    return response
+
+
+_LOG_FILENAME_PATTERN = re.compile(r"external_link_(?P<timestamp>[0-9]+)\.json\Z")
+
+
 class _LogDirectory:
     def __init__(
         self,
@@ -247,44 +220,46 @@ class _LogDirectory:
         return None
 
     def find_all(self) -> list[_LogFile]:
-        # check if the path is directory
-        if not self._directory.is_dir():
-            return []
-        # find external_link_{timestamp}.json
-        files: list[_LogFile] = []
-        pattern = re.compile(r"external_link_(?P<timestamp>[0-9]+).json")
-        for path in self._directory.iterdir():
-            # check if the path is file
-            if not path.is_file():
-                continue
-            # filename match
-            if match := pattern.match(path.name):
-                files.append(
-                    _LogFile(path=path, timestamp=int(match.group("timestamp")))
-                )
         # sort by old...new
-        files.sort(key=lambda file: file.timestamp)
-        return files
+        return sorted(self._iter_files(), key=operator.attrgetter("timestamp"))
 
     def find_latest(
         self,
         *,
         timestamp: Optional[int] = None,
     ) -> Optional[_LogFile]:
-        return next(
+        return max(
             (
                 file
-                for file in reversed(self.find_all())
+                for file in self._iter_files()
                 if timestamp is None or timestamp > file.timestamp
             ),
-            None,
+            key=operator.attrgetter("timestamp"),
+            default=None,
         )
 
+    def _iter_files(self) -> Iterator[_LogFile]:
+        # check if the path is directory
+        if not self._directory.is_dir():
+            return
+        # find external_link_{timestamp}.json
+        with os.scandir(self._directory) as entries:
+            for entry in entries:
+                # filename match
+                match = _LOG_FILENAME_PATTERN.match(entry.name)
+                # check if the path is file
+                if match is None or not entry.is_file():
+                    continue
+                yield _LogFile(
+                    path=pathlib.Path(entry.path),
+                    timestamp=int(match.group("timestamp")),
+                )
+
     def load(self, timestamp: int) -> Optional[_Log]:
         file = self.find(timestamp)
         if file is not None:
             self._logger.info(f'load log from "{file.path}"')
-            return _Log.load(file.path, file.timestamp)
+            return _Log.load(file.path, file.timestamp, validate=self._validate())
         return None
 
     def load_latest(
@@ -295,13 +270,17 @@ class _LogDirectory:
         file = self.find_latest(timestamp=timestamp)
         if file is not None:
             self._logger.info(f'load latest log from "{file.path}"')
-            return _Log.load(file.path, file.timestamp)
+            return _Log.load(file.path, file.timestamp, validate=self._validate())
         return None
 
     def save(self, log: _Log) -> None:
         path = self.file_path(log.timestamp)
         self._logger.info(f'save logs to "{path}"')
-        log.save(path)
+        log.save(path, validate=self._validate())
+
+    def _validate(self) -> bool:
+        # JSON Schema validation of logs only in verbose mode
+        return self._logger.isEnabledFor(logging.DEBUG)
 
     def clean(self, keep: int) -> None:
         if keep >= 0:
@@ -331,23 +310,25 @@ class _LogEditor:
         self._logs.update({log.url: log for log in logs})
 
     def update_links(self, links: list[ExternalLink]) -> None:
-        # match link & log
+        # match link & log by URL
+        links_by_url = {link.url: link for link in links}
+        # links with logs: update locations
         logs: dict[str, ExternalLinkLog] = {}
-        added_links: dict[str, ExternalLink] = {}
-        for link in links:
-            if link.url in self._logs:
-                # update locations
-                log = self._logs[link.url]
-                logs[log.url] = ExternalLinkLog(
-                    url=log.url,
-                    locations=link.locations[:],
-                    access_timestamp=log.access_timestamp,
-                    response=log.response,
-                    is_saved=log.is_saved,
-                )
-            else:
-                added_links[link.url] = link
-        deleted_links = set(self._logs.keys())
+        for url in links_by_url.keys() & self._logs.keys():
+            log = self._logs[url]
+            logs[url] = ExternalLinkLog(
+                url=url,
+                locations=links_by_url[url].locations[:],
+                access_timestamp=log.access_timestamp,
+                response=log.response,
+                is_saved=log.is_saved,
+            )
+        # links without logs
+        added_links = {
+            url: links_by_url[url] for url in links_by_url.keys() - self._logs.keys()
+        }
+        # logs without links
+        deleted_links = self._logs.keys() - links_by_url.keys()
         # update
         self._logs = logs
         self._added_links = added_links
@@ -374,66 +355,17 @@ class _LogEditor:
             self._logger.warning("no logs exist for {len(self._added_links)} URLs")
         return _Log(
             timestamp=self._timestamp,
-            logs=sorted(self._logs.values(), key=lambda log: log.url),
+            logs=sorted(self._logs.values(), key=operator.attrgetter("url")),
         )
 
 
-class _LinksDirectory:
-    def __init__(
-        self,
-        path: pathlib.Path,
-        logger: logging.Logger,
-    ) -> None:
-        self._path = path
-        self._logger = logger
-
-    @property
-    def path(self) -> pathlib.Path:
-        return self._path
-
-    def file_path(self, url: str) -> pathlib.Path:
-        return self._path.joinpath(_url_to_path(url))
-
-    def files(self) -> list[pathlib.Path]:
-        return [path for path in self._path.glob("*/**/*") if path.is_file()]
-
-    def gitattributes_path(self) -> pathlib.Path:
-        return self._path.joinpath(".gitattributes")
-
-    def create_gitattributes(self) -> None:
-        with self.gitattributes_path().open(mode="w", encoding="utf-8") as file:
-            file.write("**/* filter=lfs diff=lfs merge=lfs -text\n")
-            file.write(".gitattributes !filter !diff !merge text\n")
-
-    def remove_empty_directory(self) -> None:
-        # execute recursively
-        def _remove_empty_directory(path: pathlib.Path) -> None:
-            # check if the path is directory
-            if not path.is_dir():
-                return
-            # execute recursively to child directories
-            for child in path.iterdir():
-                _remove_empty_directory(child)
-            # check if empty
-            if not list(path.iterdir()):
-                self._logger.debug(f'delete empty directory: "{path}"')
-                path.rmdir()
-
-        # execute from the root directory
-        _remove_empty_directory(self._path)
-
-
-def _url_to_path(url: str) -> str:
-    return re.sub(r"https?://", "", url)
-
-
 def _setup_log_editor(
     timestamp: int,
     links: list[ExternalLink],
     log_directory: _LogDirectory,
     all_request: bool,
     logger: logging.Logger,
-) -> _LogEditor:
+) -> tuple[_LogEditor, Optional[_Log]]:
     # load previous log
     previous_log = log_directory.load_latest(timestamp=timestamp)
     # setup log editor
@@ -441,177 +373,99 @@ def _setup_log_editor(
     if not all_request and previous_log is not None:
         editor.load_logs(previous_log.logs)
     editor.update_links(links)
-    return editor
+    return editor, previous_log
 
 
 def _request(
     editor: _LogEditor,
-    links_directory: _LinksDirectory,
+    links_directory: LinksDirectory,
     config: ExternalLinkConfig,
-    create_session: Callable[[], aiohttp.ClientSession],
+    session: ExternalLinkSession,
     logger: logging.Logger,
+    *,
+    saved_files: set[pathlib.Path],
+    previous_log: Optional[_Log],
 ) -> None:
     # added links
     links = editor.added_links()
     # links that have lost their saved files
+    #  look up the files listed before request,
+    #  and stat only the files not found there
     links.extend(
         log.link()
         for log in editor.logs()
-        if log.is_saved and not links_directory.file_path(log.url).exists()
+        if log.is_saved and not _is_saved_file(links_directory, saved_files, log.url)
     )
-    # shuffle links
-    random.shuffle(links)
+    # shuffle links, spreading the links to each host over the requests
+    links = _spread_hosts(links)
     # request
-    logs = asyncio.run(
-        _request_external_links(
-            links,
-            links_directory,
-            config,
-            create_session,
-            logger,
-        )
+    logs = session.request(
+        links,
+        links_directory,
+        config,
+        logger,
+        cached_responses=_cached_responses(links_directory, saved_files, previous_log),
     )
     # add new log
     for log in logs:
         editor.update_log(log)
 
 
-async def _request_external_links(
-    links: list[ExternalLink],
-    links_directory: _LinksDirectory,
-    config: ExternalLinkConfig,
-    create_session: Callable[[], aiohttp.ClientSession],
-    logger: logging.Logger,
-) -> list[ExternalLinkLog]:
-    # semaphore
-    semaphore = asyncio.Semaphore(config.parallel_limit)
-    # request arguments
-    request_args = _RequestArguments(
-        links_directory=links_directory,
-        content_types=[re.compile(pattern) for pattern in config.content_types],
-        excluded_urls=[re.compile(pattern) for pattern in config.excluded_urls],
-    )
-
-    # parallel requests
-    async def _parallel_request(
-        session: aiohttp.ClientSession,
-        index: int,
-        link: ExternalLink,
-    ) -> ExternalLinkLog:
-        async with semaphore:
-            response = await _request_link(
-                request_args,
-                session,
-                link,
-                _RequestLogger(logger, index),
-            )
-            await asyncio.sleep(config.request_interval)
-            return response
-
-    logger.info(f"request {len(links)} links")
-
-    async with create_session() as session:
-        tasks = [_parallel_request(session, i, link) for i, link in enumerate(links)]
-        return await asyncio.gather(*tasks)
-
-
-@dataclasses.dataclass(frozen=True)
-class _RequestArguments:
-    links_directory: _LinksDirectory
-    content_types: list[re.Pattern[str]]
-    excluded_urls: list[re.Pattern[str]]
-
-    def is_target_content_type(self, content_type: Optional[str]) -> bool:
-        if content_type is None:
-            return False
-        return any(pattern.match(content_type) for pattern in self.content_types)
+def _cached_responses(
+    links_directory: LinksDirectory,
+    saved_files: set[pathlib.Path],
+    previous_log: Optional[_Log],
+) -> dict[str, ResponseLog]:
+    # saved contents that can be validated by conditional requests
+    if previous_log is None:
+        return {}
+    return {
+        log.url: log.response
+        for log in previous_log.logs
+        if log.is_saved
+        and isinstance(log.response, ResponseLog)
+        and (log.response.etag is not None or log.response.last_modified is not None)
+        and _is_saved_file(links_directory, saved_files, log.url)
+    }
 
-    def is_excluded_url(self, url: str) -> bool:
-        return any(pattern.match(url) for pattern in self.excluded_urls)
 
+def _is_saved_file(
+    links_directory: LinksDirectory,
+    saved_files: set[pathlib.Path],
+    url: str,
+) -> bool:
+    path = links_directory.file_path(url)
+    return path in saved_files or path.exists()
+
+
+def _spread_hosts(links: list[ExternalLink]) -> list[ExternalLink]:
+    # group links by host in random order
+    hosts: dict[str, list[ExternalLink]] = collections.defaultdict(list)
+    for link in random.sample(links, len(links)):
+        hosts[_url_host(link.url)].append(link)
+    # place the links of each host at even intervals with a random offset
+    positioned: list[tuple[float, ExternalLink]] = []
+    for host_links in hosts.values():
+        offset = random.random()
+        positioned.extend(
+            ((index + offset) / len(host_links), link)
+            for index, link in enumerate(host_links)
+        )
+    positioned.sort(key=operator.itemgetter(0))
+    return [link for _, link in positioned]
 
-class _RequestLogger(logging.LoggerAdapter):
-    def __init__(
-        self,
-        logger: logging.Logger,
-        index: int,
-    ) -> None:
-        super().__init__(logger)
-        self._index = index
 
-    def process(
-        self,
-        msg: Any,
-        kwargs: MutableMapping[str, Any],
-    ) -> tuple[Any, MutableMapping[str, Any]]:
-        return super().process(f"request({self._index}): {msg}", kwargs)
-
-
-async def _request_link(
-    args: _RequestArguments,
-    session: aiohttp.ClientSession,
-    link: ExternalLink,
-    logger: _RequestLogger,
-) -> ExternalLinkLog:
-    logger.debug(f"url={link.url}")
-    # access timestamp
-    access_timestamp = int(time.time())
-    # check if the url is excluded
-    if args.is_excluded_url(link.url):
-        logger.debug("excluded url")
-        return ExternalLinkLog(
-            url=link.url,
-            locations=link.locations,
-            access_timestamp=0,
-            response="excluded",
-            is_saved=False,
-        )
-    # request
+def _url_host(url: str) -> str:
     try:
-        async with session.get(link.url) as response:
-            logger.debug(f"status={response.status}")
-            response_log = ResponseLog(
-                status_code=response.status,
-                content_type=response.headers.get("content-type"),
-            )
-            logger.debug(f"response={response_log}")
-            is_saved = False
-            # check content type
-            if args.is_target_content_type(response_log.content_type):
-                logger.debug(f"save content ({response_log.content_type})")
-                # save
-                file_path = args.links_directory.file_path(link.url)
-                logger.debug(f'save to "{file_path}"')
-                if not file_path.parent.exists():
-                    file_path.parent.mkdir(parents=True)
-                with file_path.open(mode="bw") as file:
-                    file.write(await response.read())
-                is_saved = True
-            return ExternalLinkLog(
-                url=link.url,
-                locations=link.locations,
-                access_timestamp=access_timestamp,
-                response=response_log,
-                is_saved=is_saved,
-            )
-    except (asyncio.TimeoutError, aiohttp.ClientError) as error:
-        logger.debug(f"error={error.__class__.__name__}({error})")
-        return ExternalLinkLog(
-            url=link.url,
-            locations=link.locations,
-            access_timestamp=access_timestamp,
-            response=RequestError(
-                error_type=error.__class__.__name__,
-                message=str(error),
-            ),
-            is_saved=False,
-        )
+        return urllib.parse.urlsplit(url).netloc
+    except ValueError:
+        return ""
 
 
 def _commit_target(
     config: ExternalLinkConfig,
     links: list[ExternalLink],
-    directory: _LinksDirectory,
+    directory: LinksDirectory,
     log_editor: _LogEditor,
     already_saved_files: set[pathlib.Path],
 ) -> CommitTarget:
@@ -626,7 +480,7 @@ def _commit_target(
     updated = updated_files & already_saved_files
     deleted: set[pathlib.Path] = set()
     if not config.keep_deleted_links:
-        deleted = _files_with_no_links(directory, links)
+        deleted = _files_with_no_links(directory, links, already_saved_files)
     # .gitattributes
     if config.use_git_lfs:
         gitattributes_path = directory.gitattributes_path()
@@ -642,13 +496,11 @@ def _commit_target(
 
 
 def _files_with_no_links(
-    links_directory: _LinksDirectory,
+    links_directory: LinksDirectory,
     external_links: list[ExternalLink],
+    saved_files: set[pathlib.Path],
 ) -> set[pathlib.Path]:
-    saved_files = set(
-        path.relative_to(links_directory.path).as_posix()
-        for path in links_directory.files()
-    )
-    linked_files = set(_url_to_path(link.url) for link in external_links)
-    no_linked_files = saved_files - linked_files
-    return set(links_directory.path.joinpath(path) for path in no_linked_files)
+    # files saved in this run are all linked,
+    # so only the files saved before the request are checked
+    linked_files = {links_directory.file_path(link.url) for link in external_links}
+    return saved_files - linked_files
@@ -0,0 +1,560 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import datetime
+import email.utils
+import functools
+import logging
+import math
+import os
+import pathlib
+import random
+import re
+import time
+from typing import Any, Callable, Literal, MutableMapping, Optional, Self
+
+import aiohttp
+import multidict
+
+from ._backup import ExternalLink, Location
+from ._config import ExternalLinkConfig, ExternalLinkSessionConfig
+from ._utility import event_loop_factory, save_stream
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ResponseLog:
+    status_code: int
+    content_type: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @classmethod
+    def jsonschema(cls) -> dict[str, Any]:
+        schema = {
+            "type": "object",
+            "required": ["status_code", "content_type"],
+            "additionalProperties": False,
+            "properties": {
+                "status_code": {"type": "integer"},
+                "content_type": {"type": ["string", "null"]},
+                "etag": {"type": "string"},
+                "last_modified": {"type": "string"},
+            },
+        }
+        return schema
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class RequestError:
+    error_type: str
+    message: str
+
+    @classmethod
+    def jsonschema(cls) -> dict[str, Any]:
+        schema = {
+            "type": "object",
+            "required": ["error_type", "message"],
+            "additionalProperties": False,
+            "properties": {
+                "error_type": {"type": "string"},
+                "message": {"type": "string"},
+            },
+        }
+        return schema
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ExternalLinkLog:
+    url: str
+    locations: list[Location]
+    access_timestamp: int
+    response: RequestError | ResponseLog | Literal["excluded"]
+    is_saved: bool
+
+    def link(self) -> ExternalLink:
+        return ExternalLink(url=self.url, locations=self.locations)
+
+    @classmethod
+    def jsonschema(cls) -> dict[str, Any]:
+        schema = {
+            "type": "object",
+            "required": [
+                "url",
+                "locations",
+                "access_timestamp",
+                "response",
+                "is_saved",
+            ],
+            "additionalProperties": False,
+            "properties": {
+                "url": {"type": "string"},
+                "access_timestamp": {"type": "integer"},
+                "locations": {
+                    "type": "array",
+                    "items": Location.jsonschema(),
+                },
+                "response": {
+                    "oneOf": [
+                        ResponseLog.jsonschema(),
+                        RequestError.jsonschema(),
+                        {"const": "excluded"},
+                    ],
+                },
+                "is_saved": {"type": "boolean"},
+            },
+        }
+        return schema
+
+
+class ExternalLinkSession:
+    # event loop & client session kept over save_external_links calls,
+    # to reuse connections, DNS cache and TLS sessions between backups
+    def __init__(
+        self,
+        config: ExternalLinkConfig,
+        *,
+        create_session: Optional[Callable[[], aiohttp.ClientSession]] = None,
+    ) -> None:
+        self._create_session = create_session or functools.partial(
+            _create_session,
+            config.session,
+            config.parallel_limit,
+        )
+        self._runner = asyncio.Runner(loop_factory=event_loop_factory())
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._runner.run(self._session.close())
+            self._session = None
+        self._runner.close()
+
+    def request(
+        self,
+        links: list[ExternalLink],
+        links_directory: LinksDirectory,
+        config: ExternalLinkConfig,
+        logger: logging.Logger,
+        *,
+        cached_responses: Optional[dict[str, ResponseLog]] = None,
+    ) -> list[ExternalLinkLog]:
+        # create client session in the event loop
+        if self._session is None:
+            self._session = self._runner.run(self._open_session())
+        return self._runner.run(
+            _request_external_links(
+                links,
+                links_directory,
+                config,
+                self._session,
+                logger,
+                cached_responses=cached_responses or {},
+            )
+        )
+
+    async def _open_session(self) -> aiohttp.ClientSession:
+        return self._create_session()
+
+
+def _create_session(
+    config: ExternalLinkSessionConfig,
+    parallel_limit: int,
+) -> aiohttp.ClientSession:
+    # connector
+    #  the pool is bounded by the parallel requests,
+    #  and DNS results are kept while the links are requested
+    #  idle connections are kept longer than the default 15 seconds,
+    #  since the links to each host are spread over the requests
+    #  hosts are resolved with aiodns (aiohttp[speedups]), not in threads
+    connector = aiohttp.TCPConnector(
+        limit=parallel_limit,
+        limit_per_host=config.parallel_limit_per_host,
+        resolver=aiohttp.AsyncResolver(),
+        ttl_dns_cache=300,
+        keepalive_timeout=30.0,
+    )
+    # timeout
+    timeout = aiohttp.ClientTimeout(total=config.timeout)
+    # To fix ClientResponseError
+    #  Got more than 8190 bytes (xxxx) when reading Header value is too long
+    max_size = 8190 * 2
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers=_request_headers(config),
+        max_line_size=max_size,
+        max_field_size=max_size,
+    )
+
+
+def _request_headers(config: ExternalLinkSessionConfig) -> multidict.CIMultiDict:
+    headers: multidict.CIMultiDict = multidict.CIMultiDict()
+    # config.user_agent
+    if config.user_agent is not None:
+        headers["User-Agent"] = config.user_agent.create()
+    # config.request_headers
+    for key, value in config.request_headers.items():
+        headers[key] = value
+    return headers
+
+
+class LinksDirectory:
+    def __init__(
+        self,
+        path: pathlib.Path,
+        logger: logging.Logger,
+    ) -> None:
+        self._path = path
+        self._logger = logger
+        self._created_directories: set[pathlib.Path] = set()
+        self._file_paths: dict[str, pathlib.Path] = {}
+
+    @property
+    def path(self) -> pathlib.Path:
+        return self._path
+
+    def file_path(self, url: str) -> pathlib.Path:
+        # the same URL is looked up on request, on checking lost files,
+        # and on building the commit target
+        path = self._file_paths.get(url)
+        if path is None:
+            path = self._path.joinpath(_url_to_path(url))
+            self._file_paths[url] = path
+        return path
+
+    def create_parent(self, path: pathlib.Path) -> None:
+        # mkdir only once for each directory
+        #  (called from worker threads: exist_ok tolerates a duplicate mkdir)
+        parent = path.parent
+        if parent not in self._created_directories:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._created_directories.add(parent)
+
+    def files(self) -> list[pathlib.Path]:
+        return [path for path in self._path.glob("*/**/*") if path.is_file()]
+
+    def gitattributes_path(self) -> pathlib.Path:
+        return self._path.joinpath(".gitattributes")
+
+    def create_gitattributes(self) -> None:
+        with self.gitattributes_path().open(mode="w", encoding="utf-8") as file:
+            file.write("**/* filter=lfs diff=lfs merge=lfs -text\n")
+            file.write(".gitattributes !filter !diff !merge text\n")
+
+    def remove_empty_directory(self) -> None:
+        # walk from the deepest directories, reading each directory once
+        removed: set[str] = set()
+        for root, directories, files in os.walk(self._path, topdown=False):
+            # subdirectories are listed before they are removed,
+            # so the removed ones are tracked
+            if files or not removed.issuperset(
+                os.path.join(root, directory) for directory in directories
+            ):
+                continue
+            self._logger.debug(f'delete empty directory: "{root}"')
+            os.rmdir(root)
+            removed.add(root)
+
+
+_URL_SCHEME_PATTERN = re.compile(r"https?://")
+
+
+def _url_to_path(url: str) -> str:
+    # fast path: only a leading http(s) scheme
+    scheme, separator, rest = url.partition("://")
+    if separator and scheme in ("http", "https") and "://" not in rest:
+        return rest
+    # remove all schemes, including those in the path (e.g. web archive URLs)
+    return _URL_SCHEME_PATTERN.sub("", url)
+
+
+async def _request_external_links(
+    links: list[ExternalLink],
+    links_directory: LinksDirectory,
+    config: ExternalLinkConfig,
+    session: aiohttp.ClientSession,
+    logger: logging.Logger,
+    *,
+    cached_responses: dict[str, ResponseLog],
+) -> list[ExternalLinkLog]:
+    # request arguments
+    request_args = _RequestArguments(
+        links_directory=links_directory,
+        content_type_prefixes=tuple(
+            pattern for pattern in config.content_types if _is_literal(pattern)
+        ),
+        content_types=_compile_patterns(
+            tuple(
+                pattern for pattern in config.content_types if not _is_literal(pattern)
+            )
+        ),
+        excluded_urls=_compile_patterns(tuple(config.excluded_urls)),
+        retries=config.request_retries,
+        conditional_requests=config.allways_request_all_links,
+        cached_responses=cached_responses,
+    )
+
+    # results in the order of links
+    logs: list[Optional[ExternalLinkLog]] = [None] * len(links)
+    # links shared by the workers
+    targets = enumerate(links)
+
+    # request with interval
+    async def _worker() -> None:
+        for i, link in targets:
+            logs[i] = await _request_link(
+                request_args,
+                session,
+                link,
+                _RequestLogger(logger, i),
+            )
+            await asyncio.sleep(config.request_interval)
+
+    logger.info(f"request {len(links)} links")
+
+    # parallel workers
+    async with asyncio.TaskGroup() as group:
+        for _ in range(min(config.parallel_limit, len(links))):
+            group.create_task(_worker())
+    return [log for log in logs if log is not None]
+
+
+@dataclasses.dataclass(frozen=True)
+class _RequestArguments:
+    links_directory: LinksDirectory
+    content_type_prefixes: tuple[str, ...]
+    content_types: tuple[re.Pattern[str], ...]
+    excluded_urls: tuple[re.Pattern[str], ...]
+    retries: int
+    conditional_requests: bool
+    cached_responses: dict[str, ResponseLog]
+
+    def is_target_content_type(self, content_type: Optional[str]) -> bool:
+        if content_type is None:
+            return False
+        # patterns without metacharacters match as prefixes, as re.match does
+        if content_type.startswith(self.content_type_prefixes):
+            return True
+        return any(pattern.match(content_type) for pattern in self.content_types)
+
+    def is_excluded_url(self, url: str) -> bool:
+        return any(pattern.match(url) for pattern in self.excluded_urls)
+
+
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+
+def _is_literal(pattern: str) -> bool:
+    return _REGEX_METACHARACTERS.isdisjoint(pattern)
+
+
+# compiled once for all backups to commit
+@functools.cache
+def _compile_patterns(patterns: tuple[str, ...]) -> tuple[re.Pattern[str], ...]:
+    compiled = tuple(re.compile(pattern) for pattern in patterns)
+    # join the patterns into a single alternation,
+    # except those with groups or inline flags that would change their meaning
+    plain = [
+        pattern
+        for pattern in compiled
+        if pattern.groups == 0 and pattern.flags == re.UNICODE
+    ]
+    if len(plain) < 2:
+        return compiled
+    others = [pattern for pattern in compiled if pattern not in plain]
+    alternation = "|".join(f"(?:{pattern.pattern})" for pattern in plain)
+    return (re.compile(alternation), *others)
+
+
+class _RequestLogger(logging.LoggerAdapter):
+    def __init__(
+        self,
+        logger: logging.Logger,
+        index: int,
+    ) -> None:
+        super().__init__(logger)
+        self._index = index
+
+    def process(
+        self,
+        msg: Any,
+        kwargs: MutableMapping[str, Any],
+    ) -> tuple[Any, MutableMapping[str, Any]]:
+        return super().process(f"request({self._index}): {msg}", kwargs)
+
+
+_CHUNK_SIZE = 1 << 16
+
+
+async def _request_link(
+    args: _RequestArguments,
+    session: aiohttp.ClientSession,
+    link: ExternalLink,
+    logger: _RequestLogger,
+) -> ExternalLinkLog:
+    logger.debug(f"url={link.url}")
+    # access timestamp
+    access_timestamp = int(time.time())
+    # check if the url is excluded
+    if args.is_excluded_url(link.url):
+        logger.debug("excluded url")
+        return ExternalLinkLog(
+            url=link.url,
+            locations=link.locations,
+            access_timestamp=0,
+            response="excluded",
+            is_saved=False,
+        )
+    # conditional request for the saved content
+    cached_response = args.cached_responses.get(link.url)
+    headers = _conditional_headers(cached_response)
+    # request
+    attempt = 0
+    while True:
+        try:
+            async with session.get(link.url, headers=headers) as response:
+                logger.debug(f"status={response.status}")
+                # retry on rate limiting & temporary server errors
+                wait = (
+                    _retry_wait(response, attempt)
+                    if response.status in _RETRY_STATUS and attempt < args.retries
+                    else None
+                )
+                # not modified: keep the saved content
+                if response.status == 304 and cached_response is not None:
+                    logger.debug("not modified")
+                    return ExternalLinkLog(
+                        url=link.url,
+                        locations=link.locations,
+                        access_timestamp=access_timestamp,
+                        response=cached_response,
+                        is_saved=True,
+                    )
+                if wait is None:
+                    return await _save_response(
+                        args,
+                        link,
+                        response,
+                        access_timestamp,
+                        logger,
+                    )
+        except (asyncio.TimeoutError, aiohttp.ClientError) as error:
+            logger.debug(f"error={error.__class__.__name__}({error})")
+            if attempt >= args.retries:
+                return ExternalLinkLog(
+                    url=link.url,
+                    locations=link.locations,
+                    access_timestamp=access_timestamp,
+                    response=RequestError(
+                        error_type=error.__class__.__name__,
+                        message=str(error),
+                    ),
+                    is_saved=False,
+                )
+            wait = _backoff(attempt)
+        # retry
+        attempt += 1
+        logger.debug(f"retry({attempt}) after {wait:.1f} seconds")
+        await asyncio.sleep(wait)
+
+
+async def _save_response(
+    args: _RequestArguments,
+    link: ExternalLink,
+    response: aiohttp.ClientResponse,
+    access_timestamp: int,
+    logger: _RequestLogger,
+) -> ExternalLinkLog:
+    response_log = ResponseLog(
+        status_code=response.status,
+        content_type=response.headers.get("content-type"),
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"response={repr(response_log)}")
+    is_saved = False
+    # check content type
+    if args.is_target_content_type(response_log.content_type):
+        logger.debug(f"save content ({response_log.content_type})")
+        # save
+        file_path = args.links_directory.file_path(link.url)
+        logger.debug(f'save to "{file_path}"')
+        # file I/O in worker threads, not to block other requests
+        await asyncio.to_thread(args.links_directory.create_parent, file_path)
+        # stream to a temporary file,
+        #  not to leave a truncated file over the saved one on a broken stream
+        part = file_path.with_name(f"{file_path.name}.part")
+        try:
+            await save_stream(response, part, _CHUNK_SIZE)
+            await asyncio.to_thread(os.replace, part, file_path)
+        finally:
+            await asyncio.to_thread(part.unlink, missing_ok=True)
+        is_saved = True
+        # validators for the next conditional request,
+        #  only logged when all links are requested again,
+        #  keeping the log format of the other runs unchanged
+        if args.conditional_requests:
+            response_log = dataclasses.replace(
+                response_log,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+    return ExternalLinkLog(
+        url=link.url,
+        locations=link.locations,
+        access_timestamp=access_timestamp,
+        response=response_log,
+        is_saved=is_saved,
+    )
+
+
+def _conditional_headers(cached_response: Optional[ResponseLog]) -> dict[str, str]:
+    headers: dict[str, str] = {}
+    if cached_response is None:
+        return headers
+    if cached_response.etag is not None:
+        headers["If-None-Match"] = cached_response.etag
+    if cached_response.last_modified is not None:
+        headers["If-Modified-Since"] = cached_response.last_modified
+    return headers
+
+
+_RETRY_STATUS = frozenset([429, 502, 503, 504])
+_RETRY_BACKOFF_FACTOR = 1.0
+_RETRY_AFTER_LIMIT = 60.0
+
+
+def _backoff(attempt: int) -> float:
+    # exponential backoff with jitter
+    return _RETRY_BACKOFF_FACTOR * 2**attempt + random.random()
+
+
+def _retry_wait(response: aiohttp.ClientResponse, attempt: int) -> Optional[float]:
+    # Retry-After: <seconds> | <HTTP-date>
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return _backoff(attempt)
+    try:
+        wait = float(retry_after)
+    except ValueError:
+        try:
+            date = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return _backoff(attempt)
+        # naive for the "-0000" zone, which is GMT in HTTP-dates
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+        wait = date.timestamp() - time.time()
+    # "nan" & "inf" are parsed by float()
+    if not math.isfinite(wait):
+        return _backoff(attempt)
+    # give up if the server asks to wait too long
+    if wait > _RETRY_AFTER_LIMIT:
+        return None
+    return max(wait, 0.0) + random.random()
@@ -2,15 +2,17 @@ from __future__ import annotations
 
 import dataclasses
 import datetime
+import functools
 import json
 import logging
+import operator
 import os
 import pathlib
 import re
 import shutil
 import subprocess
 import textwrap
-from typing import Iterator, Optional
+from typing import Any, Iterator, Optional, Self
 
 import jsonschema
 
@@ -36,7 +38,7 @@ class Commit:
         # parse as JSON
         body = "{" + ",".join(self.body.split("\n")) + "}"
         try:
-            info = parse_json(body, schema=jsonschema_backup_info())
+            info = parse_json(body, schema=jsonschema_backup_info)
         except json.decoder.JSONDecodeError:
             return None
         except jsonschema.exceptions.ValidationError:
@@ -148,6 +150,7 @@ class Git:
         *,
         ignore_error: bool = False,
         env: Optional[dict[str, str]] = None,
+        stdin: Optional[str] = None,
     ) -> subprocess.CompletedProcess:
         self._logger.debug(f"command: {command}")
         # check if the repository exists
@@ -162,6 +165,7 @@ class Git:
             logger=self._logger,
             ignore_error=ignore_error,
             env=env,
+            stdin=stdin,
         )
 
     def branches(self) -> list[str]:
@@ -199,6 +203,48 @@ class Git:
         process = self.execute([self._executable, "ls-files", "-z"])
         return [self.path.joinpath(path) for path in process.stdout.split("\0") if path]
 
+    def changed_files(
+        self,
+        commits: list[str],
+        paths: list[str],
+    ) -> dict[str, set[str]]:
+        # added / modified paths of each commit, in one process for all commits
+        if not commits:
+            return {}
+        process = self.execute(
+            [
+                self._executable,
+                "--literal-pathspecs",
+                "diff-tree",
+                "--stdin",
+                "-z",
+                "--always",
+                "--root",
+                "--name-only",
+                "--diff-filter=MA",
+                "--",
+                *paths,
+            ],
+            stdin="".join(f"{commit}\n" for commit in commits),
+        )
+        # "<commit>\0" followed by "<path>\0" for each changed path
+        result: dict[str, set[str]] = {}
+        targets = set(paths)
+        changed: set[str] = set()
+        for name in process.stdout.split("\0"):
+            if not name:
+                continue
+            if name in targets:
+                changed.add(name)
+            else:
+                changed = result.setdefault(name, set())
+        return result
+
+    def cat_file(self) -> GitCatFile:
+        # switch branch
+        self.switch()
+        return GitCatFile(self._executable, self.path, logger=self._logger)
+
     def commit(
         self,
         target: CommitTarget,
@@ -253,9 +299,15 @@ class Git:
         command = [self._executable, "log", "-z", f"--format={log_format}"]
         if option is not None:
             command.extend(option)
-        process = self.execute(command)
+        try:
+            process = self.execute(command, ignore_error=True)
+        except subprocess.CalledProcessError as error:
+            # e.g. the branch has no commits yet
+            self._logger.warning(f"failed to get git log: {error.stderr.strip()}")
+            return []
         # parse
         commits: list[Commit] = []
+        debug = self._logger.isEnabledFor(logging.DEBUG)
         for log in process.stdout.split("\0"):
             # skip empty log
             if not log:
@@ -263,12 +315,13 @@ class Git:
             # parse log as commit
             commit = _log_to_commit(log)
             if commit is not None:
-                self._logger.debug(f"commit: {repr(commit)}")
+                if debug:
+                    self._logger.debug(f"commit: {repr(commit)}")
                 commits.append(commit)
             else:
                 self._logger.warning(f'failed to parse commit "{repr(log)}"')
         # sort by old...new
-        return sorted(commits, key=lambda commit: commit.timestamp)
+        return sorted(commits, key=operator.attrgetter("timestamp"))
 
     def latest_commit_timestamp(self) -> Optional[int]:
         # check if the repository exists
@@ -289,6 +342,66 @@ class Git:
         return None
 
 
+class GitCatFile:
+    def __init__(
+        self,
+        executable: str,
+        repository: pathlib.Path,
+        *,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self._executable = executable
+        self._repository = repository
+        self._logger = logger or logging.getLogger(__name__)
+        self._process: Optional[subprocess.Popen[bytes]] = None
+
+    def __enter__(self) -> Self:
+        # git cat-file --batch
+        command = [self._executable, "cat-file", "--batch"]
+        self._logger.debug(f"command: {command}")
+        self._process = subprocess.Popen(
+            command,
+            cwd=self._repository,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        if self._process is None:
+            return
+        # close stdin to terminate git cat-file
+        if self._process.stdin is not None:
+            self._process.stdin.close()
+        self._process.wait()
+        if self._process.stdout is not None:
+            self._process.stdout.close()
+        self._process = None
+
+    def read(self, target: str) -> Optional[bytes]:
+        if self._process is None:
+            raise RuntimeError("git cat-file is not running")
+        assert self._process.stdin is not None
+        assert self._process.stdout is not None
+        # request "<commit>:<path>"
+        self._process.stdin.write(f"{target}\n".encode("utf-8"))
+        self._process.stdin.flush()
+        # header: "<object> <type> <size>" or "<target> missing"
+        header = self._process.stdout.readline().decode("utf-8").rstrip("\n")
+        # EOF: git cat-file has exited
+        if not header:
+            raise RuntimeError(f'git cat-file exited while reading "{target}"')
+        if header.endswith((" missing", " ambiguous")):
+            self._logger.debug(f'object not found: "{target}"')
+            return None
+        _, _, size = header.rsplit(" ", 2)
+        # contents followed by LF
+        contents = self._process.stdout.read(int(size))
+        self._process.stdout.read(1)
+        return contents
+
+
+@functools.cache
 def _find_executable() -> str:
     executable = shutil.which("git")
     if executable is None:
@@ -303,6 +416,7 @@ def _execute_git_command(
     logger: Optional[logging.Logger] = None,
     ignore_error: bool = False,
     env: Optional[dict[str, str]] = None,
+    stdin: Optional[str] = None,
 ) -> subprocess.CompletedProcess:
     logger = logger or logging.getLogger(__name__)
     try:
@@ -311,6 +425,7 @@ def _execute_git_command(
             check=True,
             cwd=repository,
             env=dict(os.environ, **env) if env is not None else None,
+            input=stdin,
             encoding="utf-8",
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -344,14 +459,16 @@ def _into_steps(
         yield chunk
 
 
+_LOG_PATTERN = re.compile(
+    r"hash: (?P<hash>[0-9a-f]{40})\n"
+    r"timestamp: (?P<timestamp>\d+)\n"
+    r"body:\n(?P<body>.*?)\n?$",
+    re.DOTALL,
+)
+
+
 def _log_to_commit(log: str) -> Optional[Commit]:
-    commit_match = re.match(
-        r"hash: (?P<hash>[0-9a-f]{40})\n"
-        r"timestamp: (?P<timestamp>\d+)\n"
-        r"body:\n(?P<body>.*?)\n?$",
-        log,
-        re.DOTALL,
-    )
+    commit_match = _LOG_PATTERN.match(log)
     if commit_match is None:
         return None
     return Commit(
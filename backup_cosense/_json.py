@@ -1,39 +1,61 @@
 from __future__ import annotations
 
-import contextlib
-import json
+import asyncio
+import functools
 import logging
+import os
 import pathlib
-from typing import Any, Iterator, Optional
+from typing import Any, Awaitable, Callable, Optional, TypeVar
 
+import aiohttp
 import jsonschema
-import requests
+import orjson
+
+from ._utility import save_stream
+
+type JSONSchema = Callable[[], dict[str, Any]]
+
+_T = TypeVar("_T")
+
+
+@functools.cache
+def json_validator(schema: JSONSchema) -> jsonschema.protocols.Validator:
+    # build schema & check it only once
+    schema_ = schema()
+    validator = jsonschema.validators.validator_for(schema_)
+    validator.check_schema(schema_)
+    return validator(schema_)
+
+
+def validate_json(value: Any, schema: JSONSchema) -> None:
+    json_validator(schema).validate(value)
 
 
 def parse_json(
-    text: str,
+    text: str | bytes,
     *,
-    schema: Optional[dict] = None,
+    schema: Optional[JSONSchema] = None,
 ) -> Optional[Any]:
-    value = json.loads(text)
+    value = orjson.loads(text)
     # JSON Schema validation
     if schema is not None:
-        jsonschema.validate(instance=value, schema=schema)
+        validate_json(value, schema)
     return value
 
 
 def load_json(
     path: pathlib.Path,
     *,
-    schema: Optional[dict] = None,
+    schema: Optional[JSONSchema] = None,
 ) -> Optional[Any]:
-    if not path.exists():
+    try:
+        with path.open(mode="rb") as file:
+            value = orjson.loads(file.read())
+    except FileNotFoundError:
         return None
-    with path.open(encoding="utf-8") as file:
-        value = json.load(file)
     # JSON Schema validation
     if schema is not None:
-        jsonschema.validate(instance=value, schema=schema)
+        validate_json(value, schema)
     return value
 
 
@@ -41,55 +63,132 @@ def save_json(
     path: pathlib.Path,
     data: Any,
     *,
-    schema: Optional[dict] = None,
-    indent: Optional[int] = 2,
+    schema: Optional[JSONSchema] = None,
+    indent: bool = True,
 ) -> None:
     # JSON Schema validation
     if schema is not None:
-        jsonschema.validate(instance=data, schema=schema)
-    if not path.parent.exists():
-        path.parent.mkdir(parents=True)
-    with path.open(mode="w", encoding="utf-8") as file:
-        json.dump(
-            data,
-            file,
-            ensure_ascii=False,
-            indent=indent,
-        )
-        file.write("\n")
+        validate_json(data, schema)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # same output as json.dump(ensure_ascii=False, indent=2) with newline
+    option = orjson.OPT_APPEND_NEWLINE
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    with path.open(mode="wb") as file:
+        file.write(orjson.dumps(data, option=option))
 
 
-@contextlib.contextmanager
-def with_session(session: Optional[requests.Session]) -> Iterator[requests.Session]:
-    try:
-        if session is None:
-            temp_session = requests.Session()
-            yield temp_session
-        else:
-            yield session
-    finally:
-        if session is None:
-            temp_session.close()
+_RETRY_STATUS = frozenset([502, 503, 504])
+_CHUNK_SIZE = 1 << 20
 
 
-def request_json(
+async def request_json(
     url: str,
+    session: aiohttp.ClientSession,
     *,
-    session: Optional[requests.Session] = None,
-    timeout: Optional[float] = None,
-    schema: Optional[dict] = None,
+    retries: int = 0,
+    backoff_factor: float = 0.5,
+    schema: Optional[JSONSchema] = None,
     logger: Optional[logging.Logger] = None,
 ) -> Optional[Any]:
     logger = logger or logging.getLogger(__name__)
-    # request
-    logger.info(f"get request: {url}")
-    with with_session(session) as session_:
-        response = session_.get(url, timeout=timeout)
-        if not response.ok:
-            logger.error(f'failed to get request "{url}"')
-            return None
+    body = await _get(
+        url,
+        session,
+        aiohttp.ClientResponse.read,
+        retries=retries,
+        backoff_factor=backoff_factor,
+        logger=logger,
+    )
+    if body is None:
+        return None
     # jsonschema validation
-    value = json.loads(response.text)
-    if schema is not None:
-        jsonschema.validate(instance=value, schema=schema)
-    return value
+    return parse_json(body, schema=schema)
+
+
+async def download_json(
+    url: str,
+    session: aiohttp.ClientSession,
+    path: pathlib.Path,
+    *,
+    retries: int = 0,
+    backoff_factor: float = 0.5,
+    schema: Optional[JSONSchema] = None,
+    logger: Optional[logging.Logger] = None,
+) -> bool:
+    logger = logger or logging.getLogger(__name__)
+    # stream the response body to a temporary file
+    part = path.with_name(f"{path.name}.part")
+    part.parent.mkdir(parents=True, exist_ok=True)
+
+    async def _save(response: aiohttp.ClientResponse) -> bool:
+        await save_stream(response, part, _CHUNK_SIZE)
+        return True
+
+    try:
+        saved = await _get(
+            url,
+            session,
+            _save,
+            retries=retries,
+            backoff_factor=backoff_factor,
+            logger=logger,
+        )
+        if not saved:
+            return False
+        # jsonschema validation & save with formatting
+        await asyncio.to_thread(_format_json, part, path, schema)
+    finally:
+        # remove the temporary file, also on failed or cancelled streams
+        part.unlink(missing_ok=True)
+    return True
+
+
+async def _get(
+    url: str,
+    session: aiohttp.ClientSession,
+    read: Callable[[aiohttp.ClientResponse], Awaitable[_T]],
+    *,
+    retries: int,
+    backoff_factor: float,
+    logger: logging.Logger,
+) -> Optional[_T]:
+    for attempt in range(retries + 1):
+        # exponential backoff before retry
+        if attempt > 0:
+            wait = backoff_factor * 2 ** (attempt - 1)
+            logger.info(f"retry request after {wait} seconds: {url}")
+            await asyncio.sleep(wait)
+        # request
+        logger.info(f"get request: {url}")
+        try:
+            async with session.get(url) as response:
+                # retry on temporary server errors
+                if response.status in _RETRY_STATUS and attempt < retries:
+                    logger.warning(f'status {response.status} from "{url}"')
+                    continue
+                if not response.ok:
+                    logger.error(f'failed to get request "{url}"')
+                    return None
+                # read the body within the attempt, to retry broken streams
+                return await read(response)
+        # retry on connection errors & timeouts
+        except (asyncio.TimeoutError, aiohttp.ClientError) as error:
+            logger.warning(f'{repr(error)} from "{url}"')
+    logger.error(f'failed to get request "{url}"')
+    return None
+
+
+def _format_json(
+    source: pathlib.Path,
+    destination: pathlib.Path,
+    schema: Optional[JSONSchema],
+) -> None:
+    # save to a temporary file and rename it,
+    #  so that the destination exists only as a complete file
+    temporary = destination.with_name(f"{destination.name}.tmp")
+    try:
+        save_json(temporary, load_json(source, schema=schema))
+        os.replace(temporary, destination)
+    finally:
+        temporary.unlink(missing_ok=True)
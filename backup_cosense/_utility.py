@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import dataclasses
 import datetime
 import itertools
 import pathlib
-from typing import Optional, Self
+import sys
+from typing import Any, Callable, Coroutine, Optional, Self
+
+import aiohttp
 
 from .exceptions import CommitTargetError
 
@@ -49,3 +53,30 @@ def format_timestamp(timestamp: Optional[int]) -> str:
     if timestamp is None:
         return "None"
     return f"{datetime.datetime.fromtimestamp(timestamp)} ({timestamp})"
+
+
+async def save_stream(
+    response: aiohttp.ClientResponse,
+    path: pathlib.Path,
+    chunk_size: int,
+) -> None:
+    # file I/O in worker threads, not to block the event loop
+    file = await asyncio.to_thread(path.open, mode="wb")
+    try:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            await asyncio.to_thread(file.write, chunk)
+    finally:
+        await asyncio.to_thread(file.close)
+
+
+def run_async[T](coroutine: Coroutine[Any, Any, T]) -> T:
+    return asyncio.run(coroutine, loop_factory=event_loop_factory())
+
+
+def event_loop_factory() -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    # uvloop does not support Windows
+    if sys.platform == "win32":
+        return None
+    import uvloop  # pylint: disable=import-outside-toplevel
+
+    return uvloop.new_event_loop
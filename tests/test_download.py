@@ -0,0 +1,52 @@
+import unittest
+from typing import Optional
+
+import aiohttp.test_utils
+import aiohttp.web
+import yarl
+
+from backup_cosense._config import BackupArchiveConfig, Config, CosenseConfig, GitConfig
+from backup_cosense._download import _session
+
+
+class SessionCookieTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.config = Config(
+            cosense=CosenseConfig(
+                project="project",
+                session_id="session-id",
+                backup_archive=BackupArchiveConfig(name="archive"),
+            ),
+            git=GitConfig(path="git"),
+        )
+
+    async def test_cosense_domains(self) -> None:
+        async with _session(self.config) as session:
+            for domain in ["scrapbox.io", "cosen.se"]:
+                cookies = session.cookie_jar.filter_cookies(
+                    yarl.URL(f"https://{domain}/api/project-backup/project/list")
+                )
+                self.assertEqual(cookies["connect.sid"].value, "session-id")
+
+    async def test_other_host(self) -> None:
+        received: list[Optional[str]] = []
+
+        async def handler(request: aiohttp.web.Request) -> aiohttp.web.Response:
+            received.append(request.headers.get("Cookie"))
+            return aiohttp.web.Response()
+
+        application = aiohttp.web.Application()
+        application.router.add_get("/", handler)
+        async with aiohttp.test_utils.TestServer(application) as server:
+            async with _session(self.config) as session:
+                async with session.get(server.make_url("/")) as response:
+                    self.assertEqual(response.status, 200)
+                cookies = session.cookie_jar.filter_cookies(
+                    yarl.URL("https://example.com/")
+                )
+                self.assertNotIn("connect.sid", cookies)
+        self.assertEqual(received, [None])
+
+
+if __name__ == "__main__":
+    unittest.main()